@@ -0,0 +1,847 @@
+# -*- coding: utf-8 -*-
+"""Config Daemon
+
+A small local daemon which parses and watches configuration files
+once and serves them to many processes over a Unix domain socket,
+along with a client `ConfigClient` to talk to it.
+
+Usage:
+    $ python config_daemon.py /tmp/config.sock
+
+    >>> CLIENT = ConfigClient("/tmp/config.sock")
+    >>> CONFIG = CLIENT.get_config("/srv/settings.conf", ["production"])
+    >>> CONFIG.groupname.setting # same as with `load_config`.
+    "value of setting"
+    >>> CLIENT.get_setting("/srv/settings.conf", "groupname", "setting")
+    "value of setting"
+
+Protocol:
+    Every message is a frame made of a 4 byte big-endian length
+    followed by the payload. A payload starts with a 1 byte code
+    followed by a single encoded value. Values are encoded with a
+    1 byte tag followed by the data for that tag (see `encode_value`).
+
+    A request is `OP_GET` followed by the list
+    [path, overrides, group, setting], where group and setting may be
+    None. A response is `STATUS_OK` followed by the value, or
+    `STATUS_ERROR` followed by the error message.
+
+    A client which sends `OP_SUBSCRIBE` gets `STATUS_OK` back, and from
+    then on an `OP_CHANGED` frame with the path of every configuration
+    file that changed on disk.
+"""
+import errno
+import itertools
+import numbers
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:  # Python 2
+    import SocketServer as socketserver
+
+import config_parser
+
+# Operation codes sent in the first byte of a payload.
+OP_GET = b"G"
+OP_SUBSCRIBE = b"S"
+OP_CHANGED = b"C"
+
+# Status codes sent in the first byte of a response payload.
+STATUS_OK = b"+"
+STATUS_ERROR = b"-"
+
+# Tags used to encode values.
+TAG_NONE = b"N"
+TAG_TRUE = b"T"
+TAG_FALSE = b"F"
+TAG_INT = b"i"
+TAG_FLOAT = b"d"
+TAG_STRING = b"s"
+TAG_LIST = b"l"
+TAG_MAPPING = b"m"
+
+# Precompiled structs used by the protocol.
+FRAME_HEADER = struct.Struct(">I")
+INT_STRUCT = struct.Struct(">q")
+FLOAT_STRUCT = struct.Struct(">d")
+LENGTH_STRUCT = struct.Struct(">I")
+
+# Default number of seconds between two checks of the watched files.
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Default number of seconds after which a file nobody asked for is
+# forgotten.
+DEFAULT_IDLE_TIMEOUT = 600.0
+
+TEXT_TYPE = type(u"")
+
+
+class DaemonError(config_parser.Error):
+    """Custom error when the daemon can't serve a request.
+
+    We raise this error on the client side with the message sent
+    by the daemon, for example when the configuration file is missing
+    or isn't a valid one.
+    """
+
+    def __init__(self, message):
+        super(DaemonError, self).__init__(message)
+
+
+class ProtocolError(config_parser.Error):
+    """Custom error when a message can't be decoded.
+
+    We raise this error when a frame is truncated or contains an
+    unknown tag.
+    """
+
+    def __init__(self, message):
+        super(ProtocolError, self).__init__(message)
+
+
+def encode_string(s):
+    """Function to encode a string as length-prefixed UTF-8 bytes.
+
+    On Python 2 `str` is already bytes and is used as it is.
+    """
+    if isinstance(s, TEXT_TYPE):
+        s = s.encode("utf-8")
+    return LENGTH_STRUCT.pack(len(s)) + s
+
+
+def encode_value(value):
+    """Function to encode a value in the binary protocol format.
+
+    Supports all the types a setting value can be parsed as (int,
+    float, boolean, string and list) as well as None and dicts with
+    string keys, which are used for groups and whole configs.
+
+    Returns bytes.
+    """
+    if value is None:
+        return TAG_NONE
+    # Check for boolean before int since bool is an int.
+    if value is True:
+        return TAG_TRUE
+    if value is False:
+        return TAG_FALSE
+    if isinstance(value, numbers.Integral):
+        return TAG_INT + INT_STRUCT.pack(value)
+    if isinstance(value, float):
+        return TAG_FLOAT + FLOAT_STRUCT.pack(value)
+    if isinstance(value, (bytes, TEXT_TYPE)):
+        return TAG_STRING + encode_string(value)
+    if isinstance(value, (list, tuple)):
+        parts = [TAG_LIST, LENGTH_STRUCT.pack(len(value))]
+        parts.extend(encode_value(element) for element in value)
+        return b"".join(parts)
+    if isinstance(value, dict):
+        parts = [TAG_MAPPING, LENGTH_STRUCT.pack(len(value))]
+        for key, element in value.items():
+            parts.append(encode_string(key))
+            parts.append(encode_value(element))
+        return b"".join(parts)
+    raise TypeError("Unable to encode value of type " + type(value).__name__)
+
+
+def decode_string(data, offset):
+    """Function to decode a length-prefixed UTF-8 string.
+
+    Returns a tuple of (string, offset after the string).
+    """
+    if offset + LENGTH_STRUCT.size > len(data):
+        raise ProtocolError("Truncated string length")
+    length, = LENGTH_STRUCT.unpack_from(data, offset)
+    offset += LENGTH_STRUCT.size
+    if offset + length > len(data):
+        raise ProtocolError("Truncated string")
+    return data[offset:offset + length].decode("utf-8"), offset + length
+
+
+def decode_value(data, offset=0):
+    """Function to decode a value encoded by `encode_value`.
+
+    Dicts are decoded as `AttributeDict` objects, so a decoded group
+    or config behaves like the one returned by `load_config`.
+
+    Returns a tuple of (value, offset after the value).
+    """
+    tag = data[offset:offset + 1]
+    offset += 1
+    if tag == TAG_NONE:
+        return None, offset
+    if tag == TAG_TRUE:
+        return True, offset
+    if tag == TAG_FALSE:
+        return False, offset
+    if tag == TAG_INT or tag == TAG_FLOAT:
+        value_struct = INT_STRUCT if tag == TAG_INT else FLOAT_STRUCT
+        if offset + value_struct.size > len(data):
+            raise ProtocolError("Truncated number")
+        value, = value_struct.unpack_from(data, offset)
+        return value, offset + value_struct.size
+    if tag == TAG_STRING:
+        return decode_string(data, offset)
+    if tag == TAG_LIST or tag == TAG_MAPPING:
+        if offset + LENGTH_STRUCT.size > len(data):
+            raise ProtocolError("Truncated length")
+        count, = LENGTH_STRUCT.unpack_from(data, offset)
+        offset += LENGTH_STRUCT.size
+        if tag == TAG_LIST:
+            value = []
+            for __ in range(count):
+                element, offset = decode_value(data, offset)
+                value.append(element)
+            return value, offset
+        value = config_parser.AttributeDict()
+        for __ in range(count):
+            key, offset = decode_string(data, offset)
+            value[key], offset = decode_value(data, offset)
+        return value, offset
+    raise ProtocolError("Unknown tag " + repr(tag))
+
+
+def send_frame(sock, code, value):
+    """Function to send a frame with the given code and value."""
+    payload = code + encode_value(value)
+    sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def recv_exactly(sock, size):
+    """Function to receive exactly `size` bytes from the socket.
+
+    Returns None if the connection is closed before any byte is
+    received.
+    """
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            if chunks:
+                raise ProtocolError("Connection closed in the middle of a frame")
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock):
+    """Function to receive a frame from the socket.
+
+    Returns a tuple of (code, value), or (None, None) if the
+    connection is closed.
+    """
+    header = recv_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None, None
+    size, = FRAME_HEADER.unpack(header)
+    payload = recv_exactly(sock, size)
+    if not payload:
+        raise ProtocolError("Empty frame")
+    value, offset = decode_value(payload, 1)
+    if offset != len(payload):
+        raise ProtocolError("Trailing data in frame")
+    return payload[:1], value
+
+
+def copy_value(value):
+    """Function to return a copy of a decoded value.
+
+    Dicts and lists are copied recursively, so a caller which changes
+    the returned value doesn't change the cached one.
+    """
+    if isinstance(value, dict):
+        copied = config_parser.AttributeDict()
+        for key, element in value.items():
+            copied[key] = copy_value(element)
+        return copied
+    if isinstance(value, list):
+        return [copy_value(element) for element in value]
+    return value
+
+
+def close_socket(sock):
+    """Function to shut down and close a socket, ignoring errors."""
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except socket.error:
+        pass
+    sock.close()
+
+
+def is_text_list(value):
+    """Function to check if the value is a list of strings.
+
+    Returns a boolean.
+    """
+    return (isinstance(value, list) and
+            all(isinstance(element, TEXT_TYPE) for element in value))
+
+
+def validate_request(value):
+    """Function to validate the value of a `OP_GET` request.
+
+    The path has to be an absolute path, the overrides None or a list
+    of strings, and the group and setting None or strings. Strings are
+    always decoded as text, so bytes never get here.
+
+    Returns a tuple of (path, overrides, group, setting).
+    """
+    if not isinstance(value, list) or len(value) != 4:
+        raise ProtocolError("A request must be a list of 4 values")
+    path, overrides, group, setting = value
+    if not isinstance(path, TEXT_TYPE) or not os.path.isabs(path):
+        raise ProtocolError("The path must be an absolute path")
+    if overrides is not None and not is_text_list(overrides):
+        raise ProtocolError("The overrides must be a list of strings")
+    for name in (group, setting):
+        if name is not None and not isinstance(name, TEXT_TYPE):
+            raise ProtocolError("The group and setting must be strings")
+    return path, overrides, group, setting
+
+
+def remove_stale_socket(socket_path):
+    """Function to remove a socket file left behind by a dead daemon.
+
+    Raises `DaemonError` if a daemon still accepts connections on it.
+    Anything which isn't a socket is left alone.
+    """
+    try:
+        mode = os.stat(socket_path).st_mode
+    except OSError:
+        return
+    if not stat.S_ISSOCK(mode):
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except socket.error as error:
+        if error.errno not in (errno.ECONNREFUSED, errno.ENOENT):
+            raise
+        os.remove(socket_path)
+        return
+    finally:
+        sock.close()
+    raise DaemonError("A config daemon is already serving on " +
+                      str(socket_path))
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """Handler for a single client connection of the daemon."""
+
+    def setup(self):
+        self.server.daemon.add_connection(self.request)
+
+    def finish(self):
+        self.server.daemon.remove_connection(self.request)
+
+    def handle(self):
+        daemon = self.server.daemon
+        while True:
+            try:
+                code, value = recv_frame(self.request)
+            except (ProtocolError, socket.error):
+                return
+            if code is None:
+                return
+            if code == OP_SUBSCRIBE:
+                daemon.subscribe(self.request)
+                try:
+                    # Nothing else is expected on this connection, we
+                    # only wait for the client to close it.
+                    while self.request.recv(1):
+                        pass
+                except socket.error:
+                    pass
+                finally:
+                    daemon.unsubscribe(self.request)
+                return
+            if code != OP_GET:
+                send_frame(self.request, STATUS_ERROR,
+                           "Unknown operation " + repr(code))
+                continue
+            try:
+                path, overrides, group, setting = validate_request(value)
+                result = daemon.get(path, overrides, group, setting)
+                # Encode before sending so that an error is reported
+                # instead of a partial frame.
+                payload = encode_value(result)
+            except (config_parser.Error, IOError, ValueError, TypeError,
+                    struct.error) as error:
+                send_frame(self.request, STATUS_ERROR, str(error))
+                continue
+            payload = STATUS_OK + payload
+            self.request.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix stream server holding a reference to its daemon."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, daemon):
+        self.daemon = daemon
+        socketserver.UnixStreamServer.__init__(self, socket_path,
+                                               _RequestHandler)
+
+
+class ConfigDaemon(object):
+    """Daemon serving pre-parsed configs over a Unix domain socket.
+
+    Every configuration file is parsed once per set of overrides and
+    kept in memory. The files are checked for changes every
+    `poll_interval` seconds, in which case the parsed configs are
+    dropped and every subscribed client is notified so it can drop
+    its own cache. A subscriber which doesn't read its notifications
+    fast enough is disconnected, so it can't stall the daemon.
+
+    A file which can't be loaded isn't watched, and a file nobody
+    asked for in `idle_timeout` seconds is forgotten, in which case
+    the subscribers are notified as if it changed.
+
+    If `allowed_directories` is given, only files within those
+    directories are served.
+
+    A socket file left behind by a daemon which is gone is removed.
+    """
+
+    def __init__(self, socket_path, poll_interval=DEFAULT_POLL_INTERVAL,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, allowed_directories=None):
+        self.socket_path = socket_path
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.allowed_directories = None
+        if allowed_directories is not None:
+            self.allowed_directories = [
+                os.path.join(os.path.realpath(directory), "")
+                for directory in allowed_directories
+            ]
+        # Parsed configs keyed by path and then by sorted overrides.
+        self._configs = {}
+        # Signatures of the watched files keyed by path.
+        self._signatures = {}
+        # Generation of every watched file, which is a new number every
+        # time the file starts being watched or changes, so that a config
+        # parsed before a change isn't cached after it.
+        self._generations = {}
+        self._generation_counter = itertools.count(1)
+        # Time of the last request for every watched file.
+        self._last_used = {}
+        self._subscribers = []
+        self._connections = set()
+        self._lock = threading.Lock()
+        # Serializes notifications so frames are never interleaved.
+        self._notify_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._threads = []
+        # True while `serve_forever` runs, or is about to in a thread.
+        self._serving = False
+        remove_stale_socket(socket_path)
+        self._server = _UnixServer(socket_path, self)
+
+    def get(self, path, overrides=None, group=None, setting=None):
+        """Function to return the config, a group or a single setting.
+
+        Returns the whole config if group is None, the group if
+        setting is None and the value of the setting otherwise. A
+        missing group or setting is returned as None.
+        """
+        if not self.is_allowed_path(path):
+            raise DaemonError("Not allowed to read " + str(path))
+        config = self.get_config(path, overrides)
+        if group is None:
+            return config
+        if setting is None:
+            return config[group]
+        if config[group] is None:
+            return None
+        return config[group][setting]
+
+    def is_allowed_path(self, path):
+        """Function to check if the daemon may read the given file.
+
+        Returns a boolean.
+        """
+        if self.allowed_directories is None:
+            return True
+        real_path = os.path.realpath(path)
+        return any(real_path.startswith(directory)
+                   for directory in self.allowed_directories)
+
+    def get_config(self, path, overrides=None):
+        """Function to return the parsed config of a file.
+
+        It parses the file on first use and then returns the same
+        `AttributeDict` object until the file changes.
+        """
+        key = tuple(sorted(set(overrides or ())))
+        while True:
+            with self._lock:
+                self._last_used[path] = time.time()
+                config = self._configs.get(path, {}).get(key)
+                if config is not None:
+                    return config
+                if path not in self._signatures:
+                    # Take the signature before parsing so that a change
+                    # made while parsing is seen by the next check.
+                    self._signatures[path] = config_parser.get_file_signature(path)
+                    self._generations[path] = next(self._generation_counter)
+                generation = self._generations[path]
+            try:
+                config = config_parser.load_config(path, overrides)
+            except Exception:
+                with self._lock:
+                    # Don't keep watching a file which can't be loaded,
+                    # unless it's loaded with other overrides.
+                    if (self._generations.get(path) == generation and
+                            not self._configs.get(path)):
+                        self._forget(path)
+                raise
+            with self._lock:
+                # If the file changed or was forgotten while parsing,
+                # the config may be stale, so parse it again.
+                if self._generations.get(path) == generation:
+                    configs = self._configs.setdefault(path, {})
+                    return configs.setdefault(key, config)
+
+    def _forget(self, path):
+        self._signatures.pop(path, None)
+        self._generations.pop(path, None)
+        self._last_used.pop(path, None)
+        self._configs.pop(path, None)
+
+    def check_files(self):
+        """Function to check the watched files for changes.
+
+        Forgets the files nobody asked for in `idle_timeout` seconds,
+        drops the parsed configs of every changed file and notifies
+        the subscribers. Returns the list of forgotten and changed
+        paths.
+        """
+        changed = []
+        with self._lock:
+            idle_since = time.time() - self.idle_timeout
+            for path, last_used in list(self._last_used.items()):
+                if last_used < idle_since:
+                    self._forget(path)
+                    changed.append(path)
+
+            for path, signature in list(self._signatures.items()):
+                new_signature = config_parser.get_file_signature(path)
+                if new_signature == signature:
+                    continue
+                self._signatures[path] = new_signature
+                self._generations[path] = next(self._generation_counter)
+                self._configs.pop(path, None)
+                changed.append(path)
+            subscribers = list(self._subscribers)
+
+        if changed:
+            with self._notify_lock:
+                for path in changed:
+                    self.notify(subscribers, path)
+        return changed
+
+    def notify(self, subscribers, path):
+        """Function to notify the given subscribers that a file changed.
+
+        The frame is sent without blocking. A subscriber whose socket
+        buffer is full is disconnected, which makes its client drop
+        its whole cache.
+        """
+        payload = OP_CHANGED + encode_value(path)
+        frame = FRAME_HEADER.pack(len(payload)) + payload
+        for sock in list(subscribers):
+            try:
+                sent = sock.send(frame, socket.MSG_DONTWAIT)
+            except socket.error:
+                sent = 0
+            if sent == len(frame):
+                continue
+            self.unsubscribe(sock)
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            subscribers.remove(sock)
+
+    def subscribe(self, sock):
+        """Function to register a socket for change notifications."""
+        # Acknowledge while holding the lock so no notification is
+        # sent before the acknowledgement. Notifications are sent to a
+        # copy of the subscribers taken under the same lock.
+        with self._lock:
+            self._subscribers.append(sock)
+            send_frame(sock, STATUS_OK, None)
+
+    def unsubscribe(self, sock):
+        """Function to unregister a socket from change notifications."""
+        with self._lock:
+            if sock in self._subscribers:
+                self._subscribers.remove(sock)
+
+    def add_connection(self, sock):
+        """Function to keep track of an open client connection."""
+        with self._lock:
+            self._connections.add(sock)
+
+    def remove_connection(self, sock):
+        """Function to forget a closed client connection."""
+        with self._lock:
+            self._connections.discard(sock)
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            self.check_files()
+
+    def serve_forever(self):
+        """Function to watch the files and serve clients until shutdown."""
+        self._serving = True
+        try:
+            watcher = threading.Thread(target=self._watch)
+            watcher.daemon = True
+            watcher.start()
+            self._threads.append(watcher)
+            self._server.serve_forever()
+        finally:
+            self._serving = False
+
+    def start(self):
+        """Function to run the daemon in a background thread."""
+        # Set before the thread runs so that `shutdown` waits for it.
+        self._serving = True
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def shutdown(self):
+        """Function to stop the daemon and remove its socket file."""
+        self._stopped.set()
+        # Waiting for the server to stop only works while it's serving,
+        # it would block forever if `serve_forever` already returned or
+        # never ran.
+        if self._serving:
+            self._server.shutdown()
+        self._server.server_close()
+        with self._lock:
+            for sock in self._connections:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except socket.error:
+                    pass
+            self._subscribers = []
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class ConfigClient(object):
+    """Client for the config daemon.
+
+    Results are cached on the client side, and the cache of a file is
+    dropped as soon as the daemon notifies that the file changed.
+    Configs and groups are returned as `AttributeDict` objects, just
+    like the ones returned by `load_config`. Every call returns a new
+    copy, so changing a result doesn't change the cache.
+
+    If the connection to the daemon is lost, for example because the
+    daemon restarted or dropped a slow subscriber, the cache is
+    dropped and the client connects and subscribes again on the next
+    request. Results aren't cached while the client isn't subscribed.
+
+    Paths are made absolute before they are sent since the daemon may
+    run in a different working directory.
+    """
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._cache = {}
+        # Incremented on every notification so that a response which
+        # was computed before a change isn't cached after it.
+        self._generation = 0
+        self._cache_lock = threading.Lock()
+        # Held while talking to the daemon or (re-)connecting.
+        self._request_lock = threading.Lock()
+        self._sock = None
+        self._subscription = None
+        self._listener = None
+        self._closed = False
+        with self._request_lock:
+            self._ensure_connected()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except socket.error:
+            sock.close()
+            raise
+        return sock
+
+    def _ensure_connected(self):
+        if self._closed:
+            raise DaemonError("The config client is closed")
+        if self._listener is None or not self._listener.is_alive():
+            self._subscribe()
+        if self._sock is None:
+            self._sock = self._connect()
+
+    def _subscribe(self):
+        if self._subscription is not None:
+            close_socket(self._subscription)
+            self._subscription = None
+        subscription = self._connect()
+        try:
+            send_frame(subscription, OP_SUBSCRIBE, None)
+            code, __ = recv_frame(subscription)
+        except (ProtocolError, socket.error):
+            code = None
+        if code != STATUS_OK:
+            close_socket(subscription)
+            raise DaemonError("Unable to subscribe to change notifications")
+        self._subscription = subscription
+        self._listener = threading.Thread(target=self._listen,
+                                          args=(subscription,))
+        self._listener.daemon = True
+        self._listener.start()
+
+    def _listen(self, subscription):
+        while True:
+            try:
+                code, path = recv_frame(subscription)
+            except (ProtocolError, socket.error):
+                code = None
+            with self._cache_lock:
+                self._generation += 1
+                if code is None:
+                    # Without notifications the cache can't be trusted.
+                    self._cache.clear()
+                    return
+                for key in list(self._cache):
+                    if key[0] == path:
+                        del self._cache[key]
+
+    def _send_request(self, request):
+        # A connection made before the daemon restarted fails on first
+        # use, in which case we connect again and retry once.
+        retry = self._sock is not None
+        while True:
+            self._ensure_connected()
+            try:
+                send_frame(self._sock, OP_GET, request)
+                code, value = recv_frame(self._sock)
+            except (ProtocolError, socket.error):
+                code = value = None
+            if code is not None:
+                return code, value
+            close_socket(self._sock)
+            self._sock = None
+            if not retry:
+                raise DaemonError("Connection closed by the config daemon")
+            retry = False
+
+    def _request(self, path, overrides, group, setting):
+        path = os.path.abspath(path)
+        overrides = sorted(set(overrides or ()))
+        key = (path, tuple(overrides), group, setting)
+        with self._cache_lock:
+            if key in self._cache:
+                return copy_value(self._cache[key])
+            generation = self._generation
+
+        with self._request_lock:
+            code, value = self._send_request([path, overrides, group, setting])
+            listening = self._listener.is_alive()
+        if code != STATUS_OK:
+            raise DaemonError(value)
+
+        with self._cache_lock:
+            if listening and generation == self._generation:
+                self._cache[key] = copy_value(value)
+        return value
+
+    def get_config(self, path, overrides=None):
+        """Function to return the config of a file.
+
+        Returns an `AttributeDict` object.
+        """
+        return self._request(path, overrides, None, None)
+
+    def get_group(self, path, group, overrides=None):
+        """Function to return a single group of a config.
+
+        Returns an `AttributeDict` object, or None if the group
+        doesn't exist.
+        """
+        return self._request(path, overrides, group, None)
+
+    def get_setting(self, path, group, setting, overrides=None):
+        """Function to return the value of a single setting.
+
+        Returns None if the group or setting doesn't exist.
+        """
+        return self._request(path, overrides, group, setting)
+
+    def close(self):
+        """Function to close the connections to the daemon."""
+        with self._request_lock:
+            self._closed = True
+            for sock in (self._sock, self._subscription):
+                if sock is not None:
+                    close_socket(sock)
+            self._sock = self._subscription = None
+        if self._listener is not None:
+            self._listener.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def exit_on_signal(signum, frame):
+    """Function to handle a signal by exiting the program."""
+    raise SystemExit(0)
+
+
+def main(argv):
+    """Main function to run the daemon on the socket path given
+    as the first argument. If directories are given after it, only
+    files within them are served.
+    """
+    if len(argv) < 2:
+        sys.stderr.write(
+            "Usage: python config_daemon.py SOCKET_PATH [DIRECTORY ...]\n")
+        return 2
+    allowed_directories = argv[2:] or None
+    # Stop on SIGTERM the same way as on Ctrl-C, so the socket file
+    # is removed. The handler is set before the socket is created.
+    signal.signal(signal.SIGTERM, exit_on_signal)
+    daemon = None
+    try:
+        daemon = ConfigDaemon(argv[1],
+                              allowed_directories=allowed_directories)
+        daemon.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        if daemon is not None:
+            daemon.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
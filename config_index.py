@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""Config Index
+
+An index over many configuration files which maps every (group,
+setting) pair to the values set for it, along with the file and line
+where each value is set. It can answer questions about a whole fleet
+of configs without parsing every file again.
+
+Usage:
+    >>> INDEX = ConfigIndex()
+    >>> INDEX.update(glob.glob("/srv/hosts/*.conf"))
+    >>> INDEX.query("*", "basic_size_limit", minimum=26214400)
+    [IndexEntry(path='/srv/hosts/a.conf', line_number=2, ...), ...]
+    >>> INDEX.query("*", "path", override="production")
+    >>> INDEX.save("/var/cache/config.index")
+    >>> INDEX = ConfigIndex.load("/var/cache/config.index")
+
+Each entry keeps the override it was set for, so the same setting
+may have several entries in a file. When `overrides` are given to
+`query`, only the entry which `load_config` would pick with those
+overrides is returned for every file.
+"""
+import collections
+import fnmatch
+import json
+import numbers
+import os
+import tempfile
+
+import config_parser
+
+# Version of the format written by `ConfigIndex.save`.
+INDEX_FORMAT_VERSION = 1
+
+# Sentinel for `query` to match entries with any override, or none.
+ANY_OVERRIDE = object()
+
+# Characters which make a group or setting pattern a glob.
+GLOB_CHARACTERS = "*?["
+
+IndexEntry = collections.namedtuple(
+    "IndexEntry",
+    ["path", "line_number", "group", "setting", "override", "value"]
+)
+
+
+def is_glob(pattern):
+    """Function to check if the given pattern contains glob characters.
+
+    Returns a boolean.
+    """
+    return any(character in pattern for character in GLOB_CHARACTERS)
+
+
+def is_in_range(value, minimum, maximum):
+    """Function to check if a value is within the given range.
+
+    Both bounds are inclusive and can be None. Only int and float
+    values can be within a range; booleans, strings and lists never
+    are.
+
+    Returns a boolean.
+    """
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        return False
+    if minimum is not None and value < minimum:
+        return False
+    if maximum is not None and value > maximum:
+        return False
+    return True
+
+
+def read_entries(path):
+    """Function to read the setting entries of a configuration file.
+
+    Compressed files are decompressed transparently like with
+    `load_config`. Group lines aren't returned.
+
+    Returns a list of `IndexEntry` objects.
+    """
+    source = config_parser.get_file_source(path)
+    with open(path, "rb") as fp:
+        lines = config_parser.iter_lines(config_parser.read_chunks(fp),
+                                         source)
+        return [
+            IndexEntry(path, line_number, group, setting, override, value)
+            for line_number, group, setting, override, value
+            in config_parser.parse_entries(lines, source)
+            if setting is not None
+        ]
+
+
+class ConfigIndex(object):
+    """Index of the settings of many configuration files.
+
+    Files are indexed by their absolute path. The index remembers the
+    signature of every file so that `update` only parses the files
+    which changed since they were indexed. A file which can't be
+    parsed is kept in `errors` with the error message and has no
+    entries.
+    """
+
+    def __init__(self):
+        # Signatures of the indexed files keyed by path.
+        self.signatures = {}
+        # Error messages of the files which couldn't be parsed.
+        self.errors = {}
+        # Entries keyed by (group, setting) and then by path.
+        self._entries = {}
+        # The (group, setting) keys of every file, so that a file can
+        # be removed without looking at the keys of every other file.
+        self._keys = {}
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self.signatures
+
+    def _add_entries(self, path, entries):
+        keys = self._keys.setdefault(path, set())
+        for entry in entries:
+            key = (entry.group, entry.setting)
+            keys.add(key)
+            by_path = self._entries.setdefault(key, {})
+            by_path.setdefault(path, []).append(entry)
+
+    def add_file(self, path):
+        """Function to (re-)index a single configuration file."""
+        path = os.path.abspath(path)
+        self.remove_file(path)
+        # Take the signature before parsing so that a change made
+        # while parsing is seen by the next update. It's recorded along
+        # with the entries or the error, so a file which can't be parsed
+        # is only parsed again once it changes. If anything else goes
+        # wrong, nothing is recorded and the next update retries it.
+        signature = config_parser.get_file_signature(path)
+        try:
+            entries = read_entries(path)
+        except (config_parser.Error, EnvironmentError, ValueError) as error:
+            # ValueError covers input which isn't valid UTF-8.
+            self.errors[path] = str(error)
+            entries = []
+        self.signatures[path] = signature
+        self._add_entries(path, entries)
+
+    def remove_file(self, path):
+        """Function to remove a configuration file from the index."""
+        path = os.path.abspath(path)
+        if path not in self.signatures:
+            return
+        del self.signatures[path]
+        self.errors.pop(path, None)
+        for key in self._keys.pop(path, ()):
+            by_path = self._entries[key]
+            del by_path[path]
+            if not by_path:
+                del self._entries[key]
+
+    def update(self, paths):
+        """Function to bring the index in sync with the given files.
+
+        Files which are new or changed on disk are (re-)indexed and
+        indexed files which aren't in `paths` are removed.
+
+        Returns a list of the added, changed and removed paths.
+        """
+        paths = set(os.path.abspath(path) for path in paths)
+        changed = []
+        for path in sorted(set(self.signatures) - paths):
+            self.remove_file(path)
+            changed.append(path)
+        for path in sorted(paths):
+            if (path in self.signatures and
+                    self.signatures[path] ==
+                    config_parser.get_file_signature(path)):
+                continue
+            self.add_file(path)
+            changed.append(path)
+        return changed
+
+    def query(self, group="*", setting="*", override=ANY_OVERRIDE,
+              overrides=None, minimum=None, maximum=None):
+        """Function to search the index for entries.
+
+        `group` and `setting` are either names or glob patterns.
+        `override` restricts the entries to the ones set for that
+        override, or to the ones without override if it's None. If
+        `overrides` is given, only the entry in effect with those
+        overrides is kept for every file and setting. `minimum` and
+        `maximum` restrict the entries to numeric values in that
+        inclusive range.
+
+        Returns a list of `IndexEntry` objects sorted by path and
+        line number.
+        """
+        if is_glob(group) or is_glob(setting):
+            keys = [
+                key for key in self._entries
+                if fnmatch.fnmatchcase(key[0], group) and
+                fnmatch.fnmatchcase(key[1], setting)
+            ]
+        else:
+            keys = [(group, setting)] if (group, setting) in self._entries else []
+
+        enabled_overrides = None
+        if overrides is not None:
+            enabled_overrides = set(overrides)
+
+        results = []
+        for key in keys:
+            for entries in self._entries[key].values():
+                if enabled_overrides is not None:
+                    # The last applicable line wins, like in `load_config`.
+                    applicable = [
+                        entry for entry in entries
+                        if entry.override is None or
+                        entry.override in enabled_overrides
+                    ]
+                    entries = applicable[-1:]
+                for entry in entries:
+                    if (override is not ANY_OVERRIDE and
+                            entry.override != override):
+                        continue
+                    if ((minimum is not None or maximum is not None) and
+                            not is_in_range(entry.value, minimum, maximum)):
+                        continue
+                    results.append(entry)
+
+        results.sort(key=lambda entry: (entry.path, entry.line_number))
+        return results
+
+    def save(self, index_path):
+        """Function to persist the index to a local file.
+
+        The index is written to a temporary file in the same
+        directory, synced to disk and then renamed, so a reader never
+        sees a partially written index, even after a crash or with
+        concurrent saves. Like any file made by `tempfile.mkstemp`,
+        the index is only readable by its owner.
+        """
+        files = {}
+        for path, signature in self.signatures.items():
+            files[path] = {
+                "signature": signature,
+                "error": self.errors.get(path),
+                "entries": [],
+            }
+        for by_path in self._entries.values():
+            for path, entries in by_path.items():
+                files[path]["entries"].extend(
+                    [entry.line_number, entry.group, entry.setting,
+                     entry.override, entry.value]
+                    for entry in entries
+                )
+
+        directory = os.path.dirname(os.path.abspath(index_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as fp:
+                json.dump({"version": INDEX_FORMAT_VERSION, "files": files},
+                          fp)
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.rename(temp_path, index_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, index_path):
+        """Function to load an index persisted by `save`.
+
+        Returns a `ConfigIndex` object.
+        """
+        with open(index_path) as fp:
+            data = json.load(fp)
+        if data.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError("Unsupported index format version " +
+                             str(data.get("version")) + " in " +
+                             str(index_path))
+
+        index = cls()
+        for path, record in data["files"].items():
+            signature = record["signature"]
+            if signature is not None:
+                signature = tuple(signature)
+            index.signatures[path] = signature
+            if record["error"] is not None:
+                index.errors[path] = record["error"]
+            # Entries of a setting have to stay in line order so that
+            # the last one wins when resolving overrides.
+            index._add_entries(path, [
+                IndexEntry(path, *fields)
+                for fields in sorted(record["entries"],
+                                     key=lambda fields: fields[0])
+            ])
+        return index
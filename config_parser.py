@@ -2,7 +2,10 @@
 """Config Parser
 
 A simple config parser which provides a method `load_config` to
-read and parse configuration from a given file.
+read and parse configuration from a given file. The same parser is
+also available for file objects through `load` and for in-memory
+strings or bytes through `loads`. Gzip, bzip2 and xz compressed input
+is decompressed transparently.
 
 Usage:
     >>> CONFIG = load_config("/srv/settings.conf", ["ubuntu", "production"]))
@@ -10,8 +13,24 @@ Usage:
     "value of setting"
     >>> CONFIG.groupname # returns a dict with all settings for `groupname`.
     {"setting": "value"}
+    >>> CONFIG = loads("[groupname]\nsetting = value\n")
 """
+import bz2
+import codecs
+import os
 import re
+import zlib
+
+try:
+    import lzma
+except ImportError:  # Python 2 doesn't ship lzma in the standard library.
+    lzma = None
+
+# Errors raised by the decompressors on corrupt input. bz2 raises
+# IOError (OSError on Python 3) and EOFError.
+DECOMPRESSOR_ERRORS = (zlib.error, IOError, EOFError)
+if lzma is not None:
+    DECOMPRESSOR_ERRORS += (lzma.LZMAError,)
 
 # Compiled regular expression for matching group name.
 _GROUP_TMPL = r"""
@@ -57,6 +76,27 @@ _QUOTED_STRING_TMPL = r"""
     """
 QUOTED_STRING_CRE = re.compile(_QUOTED_STRING_TMPL, re.VERBOSE)
 
+# Magic numbers used to detect compressed input.
+GZIP_MAGIC = b"\x1f\x8b"
+BZIP2_MAGIC = b"BZh"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+MAX_MAGIC_LENGTH = max(len(GZIP_MAGIC), len(BZIP2_MAGIC), len(XZ_MAGIC))
+
+# Number of bytes (or characters) read from the input at one time.
+# Decompressed output is also produced in chunks of at most this size.
+CHUNK_SIZE = 64 * 1024
+
+# Number of compressed bytes fed at one time to a decompressor which
+# can't limit the size of its output (bz2 on Python 2).
+SMALL_INPUT_SIZE = 1024
+
+# Encoding used to decode bytes input.
+DEFAULT_ENCODING = "utf-8"
+
+# Source labels used in error messages when the input has no file name.
+STRING_SOURCE = "<string>"
+STREAM_SOURCE = "<stream>"
+
 # Permitted boolean values for this config parser.
 PERMITTED_BOOLEAN_VALUES = {
     "yes": True, "no": False,
@@ -79,9 +119,9 @@ class DuplicateGroupError(Error):
     while parsing the configuration file.
     """
 
-    def __init__(self, group, file_path, line_number):
+    def __init__(self, group, source, line_number):
         message = "Duplicate group '" + str(group) + "' found at line " + \
-            str(line_number) + " while parsing file at " + str(file_path)
+            str(line_number) + " while parsing " + str(source)
         super(DuplicateGroupError, self).__init__(message)
 
 
@@ -92,9 +132,9 @@ class InvalidLineError(Error):
     according to any of the known patterns.
     """
 
-    def __init__(self, file_path, line_number):
+    def __init__(self, source, line_number):
         message = "Unable to parse line " + \
-            str(line_number) + " while parsing file at " + str(file_path)
+            str(line_number) + " while parsing " + str(source)
         super(InvalidLineError, self).__init__(message)
 
 
@@ -106,12 +146,25 @@ class MissingGroupError(Error):
     settings in the beginning of the file.
     """
 
-    def __init__(self, file_path, line_number):
+    def __init__(self, source, line_number):
         message = "Unable to find a group at line " + \
-            str(line_number) + " while parsing file at " + str(file_path)
+            str(line_number) + " while parsing " + str(source)
         super(MissingGroupError, self).__init__(message)
 
 
+class DecompressionError(Error):
+    """Custom error when compressed input can't be decompressed.
+
+    We raise this error when the compressed data is corrupt or
+    truncated, or when its format isn't supported.
+    """
+
+    def __init__(self, source, reason):
+        message = "Unable to decompress data while parsing " + \
+            str(source) + ": " + str(reason)
+        super(DecompressionError, self).__init__(message)
+
+
 class AttributeDict(dict):
     """Custom dict object for attribute access.
 
@@ -323,93 +376,419 @@ def parse_value(value):
     return value
 
 
-def load_config(file_path, overrides=None):
-    """Main function to parse a configuration file from a given
-    file path and a list of overrides. It return config as
-    an `AttributeDict` object.
+def get_file_source(name):
+    """Function to return the source label of a file.
+
+    Returns a string used to name the file in error messages.
     """
-    # Initialize config as AttributeDict.
-    config = AttributeDict()
+    return "file at " + str(name)
+
+
+def get_file_signature(path):
+    """Function to return the signature of a file on disk.
+
+    The signature changes whenever the file is modified or replaced.
+    Returns None if the file doesn't exist.
+    """
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+    return (file_stat.st_ino, file_stat.st_size, file_stat.st_mtime)
+
+
+def read_chunks(fp):
+    """Function to read a file object chunk by chunk.
+
+    Returns a generator of chunks of at most `CHUNK_SIZE` size.
+    """
+    while True:
+        chunk = fp.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+def slice_chunks(s):
+    """Function to slice a string or bytes object into chunks.
+
+    Returns a generator of chunks of at most `CHUNK_SIZE` size, so
+    that the rest of the pipeline treats in-memory input the same
+    way as a file object.
+    """
+    for start in range(0, len(s), CHUNK_SIZE):
+        yield s[start:start + CHUNK_SIZE]
+
+
+class StreamDecompressor(object):
+    """Incremental decompressor of a single compressed stream.
+
+    It wraps a zlib, bz2 or lzma decompressor so that every piece of
+    output is at most `CHUNK_SIZE` long, and so that the end of the
+    stream can be detected on Python 2 as well, where the
+    decompressors have no `eof` attribute. Errors raised by the
+    decompressor are raised as `DecompressionError`.
+    """
+
+    def __init__(self, decompressor, source):
+        self._decompressor = decompressor
+        self._source = source
+        # Input left over after the end of the stream which was never
+        # fed to the decompressor.
+        self._unfed_data = b""
+
+    @property
+    def eof(self):
+        """True once the end of the stream has been reached."""
+        decompressor = self._decompressor
+        eof = getattr(decompressor, "eof", None)
+        if eof is not None:
+            return eof
+        if self._unfed_data or decompressor.unused_data:
+            return True
+        if hasattr(decompressor, "unconsumed_tail"):
+            # A finished zlib stream moves any further input to
+            # `unused_data`, so try that on a copy.
+            probe = decompressor.copy()
+            try:
+                probe.decompress(b"\x00")
+            except zlib.error:
+                return False
+            return bool(probe.unused_data)
+        # A finished bz2 stream refuses any further input.
+        try:
+            decompressor.decompress(b"")
+        except EOFError:
+            return True
+        return False
+
+    @property
+    def unused_data(self):
+        """Input found after the end of the stream."""
+        return self._decompressor.unused_data + self._unfed_data
+
+    def decompress(self, data):
+        """Function to decompress the given data.
+
+        Returns a generator of chunks of at most `CHUNK_SIZE` size.
+        """
+        try:
+            for chunk in self._decompress(data):
+                yield chunk
+        except DECOMPRESSOR_ERRORS as error:
+            raise DecompressionError(self._source, error)
+
+    def _decompress(self, data):
+        decompressor = self._decompressor
+        if hasattr(decompressor, "unconsumed_tail"):  # zlib
+            while True:
+                chunk = decompressor.decompress(data, CHUNK_SIZE)
+                if chunk:
+                    yield chunk
+                data = decompressor.unconsumed_tail
+                # A full chunk means more output may still be pending.
+                if not data and len(chunk) < CHUNK_SIZE:
+                    return
+        elif hasattr(decompressor, "needs_input"):  # bz2 and lzma on Python 3
+            while True:
+                chunk = decompressor.decompress(data, CHUNK_SIZE)
+                if chunk:
+                    yield chunk
+                data = b""
+                if decompressor.eof or decompressor.needs_input:
+                    return
+        else:  # bz2 on Python 2 can't limit its output.
+            for start in range(0, len(data), SMALL_INPUT_SIZE):
+                if self.eof:
+                    self._unfed_data = data[start:]
+                    return
+                chunk = decompressor.decompress(
+                    data[start:start + SMALL_INPUT_SIZE])
+                for chunk_start in range(0, len(chunk), CHUNK_SIZE):
+                    yield chunk[chunk_start:chunk_start + CHUNK_SIZE]
+
+
+def get_decompressor(head, source=STREAM_SOURCE):
+    """Function to return a decompressor for the given leading bytes.
+
+    Returns a `StreamDecompressor` object if the bytes start with the
+    magic number of a known compression format, otherwise None.
+    """
+    if head.startswith(GZIP_MAGIC):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif head.startswith(BZIP2_MAGIC):
+        decompressor = bz2.BZ2Decompressor()
+    elif head.startswith(XZ_MAGIC):
+        if lzma is None:
+            raise DecompressionError(
+                source, "xz compressed input isn't supported without "
+                "the lzma module")
+        decompressor = lzma.LZMADecompressor()
+    else:
+        return None
+    return StreamDecompressor(decompressor, source)
+
+
+def read_head(chunks, head=None):
+    """Function to read enough chunks to detect a compressed stream.
+
+    Returns the given head followed by the chunks read, which is at
+    least `MAX_MAGIC_LENGTH` long unless the input ends before.
+    """
+    for chunk in chunks:
+        head = chunk if head is None else head + chunk
+        if not isinstance(head, bytes) or len(head) >= MAX_MAGIC_LENGTH:
+            break
+    return head
+
+
+def decompress_chunks(chunks, source=STREAM_SOURCE):
+    """Function to transparently decompress the given chunks.
+
+    We look at the first few bytes to detect a compressed stream. If
+    the input is text, or doesn't look compressed, the chunks are
+    passed through unchanged. Concatenated streams, like the members
+    of a multi-member gzip file, are all decompressed. Corrupt or
+    truncated input raises `DecompressionError`.
+    """
+    chunks = iter(chunks)
+    head = read_head(chunks)
+    if not head:
+        return
+
+    decompressor = None
+    if isinstance(head, bytes):
+        decompressor = get_decompressor(head, source)
+    if decompressor is None:
+        yield head
+        for chunk in chunks:
+            yield chunk
+        return
+
+    data = head
+    while True:
+        for chunk in decompressor.decompress(data):
+            yield chunk
+        if decompressor.eof:
+            # Whatever follows the end of the stream has to be another
+            # compressed stream.
+            data = read_head(chunks, decompressor.unused_data)
+            if not data:
+                return
+            decompressor = get_decompressor(data, source)
+            if decompressor is None:
+                raise DecompressionError(
+                    source, "unexpected data after the end of the "
+                    "compressed stream")
+            continue
+        data = next(chunks, None)
+        if data is None:
+            raise DecompressionError(source, "compressed stream is truncated")
+
+
+def decode_chunks(chunks, encoding=DEFAULT_ENCODING):
+    """Function to decode the given chunks into text.
+
+    Bytes chunks are decoded with an incremental decoder so that a
+    multi-byte character split across two chunks is handled. On
+    Python 2 `bytes` is `str`, which the parser handles as it is.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        if isinstance(chunk, bytes) and not isinstance(chunk, str):
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+    tail = decoder.decode(b"", True)
+    if tail:
+        yield tail
+
+
+def split_lines(chunks):
+    """Function to split the given text chunks into lines.
+
+    Returns a generator of lines. A line may span several chunks,
+    in which case only that line is kept in memory until its end
+    is found.
+    """
+    pending = None
+    for chunk in chunks:
+        start = 0
+        end = chunk.find("\n")
+        while end != -1:
+            line = chunk[start:end + 1]
+            if pending is not None:
+                line = pending + line
+                pending = None
+            yield line
+            start = end + 1
+            end = chunk.find("\n", start)
+        if start < len(chunk):
+            tail = chunk[start:]
+            pending = tail if pending is None else pending + tail
+    if pending is not None:
+        yield pending
+
+
+def iter_lines(chunks, source=STREAM_SOURCE):
+    """Function to return the lines of a (possibly compressed) input.
+
+    The `source` is only used to name the input in error messages.
+    Returns a generator of text lines from the given chunks of
+    text or bytes.
+    """
+    return split_lines(decode_chunks(decompress_chunks(chunks, source)))
+
+
+def parse_entries(lines, source):
+    """Function to parse the entries of a configuration from the given lines.
+
+    It yields a tuple of (line_number, group, setting, override, value)
+    for every group and setting line, in the order they appear. For a
+    group line, setting, override and value are None. For a setting
+    line without override, override is None.
+
+    The `source` is only used to name the input in error messages.
+    """
+    # Keeping track of the groups seen so far to find duplicates.
+    seen_groups = set()
     # Keeping track of line number here to be used for error reporting.
     line_number = 0
     # Keeping track of current group here to be used to save
     # setting, value pairs.
     curr_group = None
 
+    # Read the given lines one by one.
+    # This is a handy way to handle reading big files where we
+    # don't need to keep more than one line in memory at one time.
+    for line in lines:
+        line_number += 1
+
+        # Trim off the inline comment from end of the line.
+        line = trim_comment(line)
+
+        # Skip the empty lines.
+        # Here, we are also covering the line which contains a comment
+        # only. For such a line, we will be left with empty string after
+        # trimming the comment on last line.
+        if is_empty_line(line):
+            continue
+
+        # Try to parse group name from current line.
+        new_group = parse_group_name(line)
+        if new_group is not None:
+            # If we have seen this group before, raise exception.
+            #
+            # IDEA: We have two alternate options here.
+            # - we can overwrite the group settings if we find it again.
+            # - we can ignore if a group is found as a duplicate.
+            if new_group in seen_groups:
+                raise DuplicateGroupError(new_group,
+                                          source,
+                                          line_number)
+
+            seen_groups.add(new_group)
+            # Update current group to which we will be saving all
+            # next settings.
+            curr_group = new_group
+            yield line_number, new_group, None, None, None
+            continue
+
+        # Try to parse (setting, value) pair from current line.
+        original_setting, value = parse_setting_value(line)
+        if original_setting is not None and value is not None:
+            # If we found a settings line, however, there was no group
+            # found before while parsing this file, raise exception.
+            #
+            # IDEA: This scenario is up to us how we want to handle it.
+            # Alternatively, we could also simply ignore all settings
+            # until we find a group in the file.
+            if curr_group is None:
+                raise MissingGroupError(source, line_number)
+
+            # Try to parse according to setting override pattern.
+            setting_without_override, override, __ = parse_setting_override_value(line)
+            if override is None:   # no override found
+                yield line_number, curr_group, original_setting, None, value
+            else:
+                yield (line_number, curr_group, setting_without_override,
+                       override, value)
+            continue
+
+        # If we reach this point, that means we weren't able to parse
+        # the current line in any of the known ways.
+        #
+        # IDEA: This decision is up to us how we want to handle it.
+        # Alternatively, we could also simply ignore any line that we don't
+        # identify and keep on reading the file further.
+        raise InvalidLineError(source, line_number)
+
+
+def parse_lines(lines, source, overrides=None):
+    """Function to parse configuration from the given lines.
+
+    The `source` is only used to name the input in error messages.
+    It returns config as an `AttributeDict` object.
+    """
+    # Initialize config as AttributeDict.
+    config = AttributeDict()
+
     # Convert overrides into a set so that we can easily look up
     # if a given override is enabled or not.
     enabled_overrides = set()
     if overrides is not None:
         enabled_overrides = set(overrides)
 
-    # Open the given file and read it line by line.
-    # This is a handy way to handle reading big files where we
-    # don't need to keep more than one line in memory at one time.
-    with open(file_path) as fp:
-        for line in fp:
-            line_number += 1
-
-            # Trim off the inline comment from end of the line.
-            line = trim_comment(line)
-
-            # Skip the empty lines.
-            # Here, we are also covering the line which contains a comment
-            # only. For such a line, we will be left with empty string after
-            # trimming the comment on last line.
-            if is_empty_line(line):
-                continue
-
-            # Try to parse group name from current line.
-            new_group = parse_group_name(line)
-            if new_group is not None:
-                # If we have seen this group before, raise exception.
-                #
-                # IDEA: We have two alternate options here.
-                # - we can overwrite the group settings if we find it again.
-                # - we can ignore if a group is found as a duplicate.
-                if new_group in config:
-                    raise DuplicateGroupError(new_group,
-                                              file_path,
-                                              line_number)
-
-                # Initialize a new AttributeDict since this is a new group.
-                config[new_group] = AttributeDict()
-                # Update current group to which we will be saving all
-                # next settings.
-                curr_group = new_group
-                continue
-
-            # Try to parse (setting, value) pair from current line.
-            original_setting, value = parse_setting_value(line)
-            if original_setting is not None and value is not None:
-                # If we found a settings line, however, there was no group
-                # found before while parsing this file, raise exception.
-                #
-                # IDEA: This scenario is up to us how we want to handle it.
-                # Alternatively, we could also simply ignore all settings
-                # until we find a group in the file.
-                if curr_group is None:
-                    raise MissingGroupError(file_path, line_number)
-
-                # Try to parse according to setting override pattern.
-                setting_without_override, override, __ = parse_setting_override_value(line)
-                if override is None:   # no override found
-                    config[curr_group][original_setting] = value
-                elif override in enabled_overrides:  # an enabled override found
-                    config[curr_group][setting_without_override] = value
-                continue
-
-            # If we reach this point, that means we weren't able to parse
-            # the current line in any of the known ways.
-            #
-            # IDEA: This decision is up to us how we want to handle it.
-            # Alternatively, we could also simply ignore any line that we don't
-            # identify and keep on reading the file further.
-            raise InvalidLineError(file_path, line_number)
+    for __, group, setting, override, value in parse_entries(lines, source):
+        if setting is None:
+            # Initialize a new AttributeDict since this is a new group.
+            config[group] = AttributeDict()
+        elif override is None:   # no override found
+            config[group][setting] = value
+        elif override in enabled_overrides:  # an enabled override found
+            config[group][setting] = value
 
     return config
 
 
+def load(fp, overrides=None, source=None):
+    """Function to parse configuration from a file object.
+
+    The file object can be opened in text or binary mode, and its
+    contents can be compressed. The file is read chunk by chunk. If
+    `source` isn't given, error messages use the name of the file
+    object when it has one. It returns config as an `AttributeDict`
+    object.
+    """
+    if source is None:
+        name = getattr(fp, "name", None)
+        if isinstance(name, str):
+            source = get_file_source(name)
+        else:
+            source = STREAM_SOURCE
+    return parse_lines(iter_lines(read_chunks(fp), source), source, overrides)
+
+
+def loads(s, overrides=None, source=STRING_SOURCE):
+    """Function to parse configuration from a string or bytes object.
+
+    Bytes can be compressed, in which case they are decompressed
+    chunk by chunk. It returns config as an `AttributeDict` object.
+    """
+    return parse_lines(iter_lines(slice_chunks(s), source), source, overrides)
+
+
+def load_config(file_path, overrides=None):
+    """Main function to parse a configuration file from a given
+    file path and a list of overrides. It return config as
+    an `AttributeDict` object.
+    """
+    # Open the file in binary mode so that a compressed file can be
+    # detected and decompressed transparently.
+    with open(file_path, "rb") as fp:
+        return load(fp, overrides, source=get_file_source(file_path))
+
+
 if __name__ == "__main__":
     CONFIG = load_config("./config_data/sample_config.conf", overrides=['ubuntu', 'production'])
-    print CONFIG
+    print(CONFIG)
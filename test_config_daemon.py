@@ -0,0 +1,388 @@
+# Run with: `python -m unittest discover`
+
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import config_daemon
+import config_parser
+
+
+class TestEncodeValue(unittest.TestCase):
+    """Class to test `encode_value` and `decode_value` methods."""
+
+    def assertRoundTrip(self, value):
+        data = config_daemon.encode_value(value)
+        decoded, offset = config_daemon.decode_value(data)
+        self.assertEqual(decoded, value)
+        self.assertEqual(offset, len(data))
+        return decoded
+
+    def test_primitive_values(self):
+        for value in [None, True, False, 0, -26214400, 1.5, "", "/tmp/"]:
+            self.assertRoundTrip(value)
+
+    def test_boolean_is_not_int(self):
+        self.assertIs(self.assertRoundTrip(True), True)
+
+    def test_list_value(self):
+        self.assertRoundTrip([1, "two", 3.0, False])
+
+    def test_config_value(self):
+        CONFIG = config_parser.load_config(
+            "./test_config_data/config_small.conf")
+        decoded = self.assertRoundTrip(CONFIG)
+        self.assertIsInstance(decoded, config_parser.AttributeDict)
+        self.assertEqual(decoded.ftp.name, "hello there, ftp uploading")
+        self.assertIsNone(decoded.ftp.something)
+
+    def test_unknown_type(self):
+        with self.assertRaises(TypeError):
+            config_daemon.encode_value(object())
+
+    def test_truncated_value(self):
+        data = config_daemon.encode_value("/tmp/")
+        with self.assertRaises(config_daemon.ProtocolError):
+            config_daemon.decode_value(data[:-1])
+
+    def test_unknown_tag(self):
+        with self.assertRaises(config_daemon.ProtocolError):
+            config_daemon.decode_value(b"?")
+
+
+class TestConfigDaemon(unittest.TestCase):
+    """Class to test `ConfigDaemon` and `ConfigClient` classes."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.directory, "settings.conf")
+        shutil.copy("./test_config_data/config_small.conf", self.config_path)
+        socket_path = os.path.join(self.directory, "config.sock")
+        # Use a long poll interval so the tests decide when files
+        # are checked for changes.
+        self.daemon = config_daemon.ConfigDaemon(socket_path,
+                                                 poll_interval=60)
+        self.daemon.start()
+        self.client = config_daemon.ConfigClient(socket_path)
+
+    def tearDown(self):
+        self.client.close()
+        self.daemon.shutdown()
+        shutil.rmtree(self.directory)
+
+    def rewrite_config(self, contents):
+        with open(self.config_path, "w") as fp:
+            fp.write(contents)
+        # Make sure the signature changes even on coarse mtimes.
+        stat = os.stat(self.config_path)
+        os.utime(self.config_path, (stat.st_atime, stat.st_mtime + 10))
+
+    def test_get_config(self):
+        CONFIG = self.client.get_config(self.config_path,
+                                        overrides=["ubuntu"])
+        self.assertEqual(
+            CONFIG,
+            config_parser.load_config(self.config_path, overrides=["ubuntu"])
+        )
+        self.assertEqual(CONFIG.ftp.path, "/etc/var/uploads")
+        self.assertIsNone(CONFIG.something)
+
+    def test_get_group(self):
+        GROUP = self.client.get_group(self.config_path, "http")
+        self.assertListEqual(GROUP.params, ["array", "of", "values"])
+        self.assertIsNone(self.client.get_group(self.config_path, "missing"))
+
+    def test_get_setting(self):
+        self.assertEqual(
+            self.client.get_setting(self.config_path, "ftp", "path",
+                                    overrides=["production"]),
+            "/srv/var/tmp/"
+        )
+        self.assertIsNone(
+            self.client.get_setting(self.config_path, "missing", "path"))
+
+    def test_daemon_parses_once(self):
+        self.client.get_config(self.config_path)
+        with config_daemon.ConfigClient(self.daemon.socket_path) as client:
+            client.get_setting(self.config_path, "ftp", "path")
+        self.assertEqual(len(self.daemon._configs), 1)
+
+    def test_client_cache_returns_copies(self):
+        first = self.client.get_group(self.config_path, "ftp")
+        first.path = "/changed/"
+        first["enabled"] = True
+        second = self.client.get_group(self.config_path, "ftp")
+        self.assertIsNot(second, first)
+        self.assertEqual(second.path, "/tmp/")
+        self.assertFalse(second.enabled)
+
+        params = self.client.get_setting(self.config_path, "http", "params")
+        params.append("changed")
+        self.assertListEqual(
+            self.client.get_setting(self.config_path, "http", "params"),
+            ["array", "of", "values"]
+        )
+
+    def test_change_while_parsing_is_not_cached(self):
+        load_config = config_daemon.config_parser.load_config
+        new_path = os.path.join(self.directory, "new.conf")
+        with open(new_path, "w") as fp:
+            fp.write("[common]\nx = 2\n")
+
+        def load_config_then_replace(path, overrides=None):
+            config = load_config(path, overrides)
+            # Replace the file after it was read, before the daemon
+            # caches the config.
+            if not os.path.exists(new_path):
+                return config
+            os.rename(new_path, self.config_path)
+            stat = os.stat(self.config_path)
+            os.utime(self.config_path, (stat.st_atime, stat.st_mtime + 10))
+            self.assertListEqual(self.daemon.check_files(),
+                                 [self.config_path])
+            return config
+
+        config_daemon.config_parser.load_config = load_config_then_replace
+        try:
+            CONFIG = self.daemon.get_config(self.config_path)
+        finally:
+            config_daemon.config_parser.load_config = load_config
+        self.assertEqual(CONFIG.common.x, 2)
+        self.assertIs(self.daemon.get_config(self.config_path), CONFIG)
+        self.assertListEqual(self.daemon.check_files(), [])
+
+    def test_stuck_subscriber_is_dropped(self):
+        subscribers = set(self.daemon._subscribers)
+        stuck = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stuck.connect(self.daemon.socket_path)
+        config_daemon.send_frame(stuck, config_daemon.OP_SUBSCRIBE, None)
+        self.assertEqual(config_daemon.recv_frame(stuck)[0],
+                         config_daemon.STATUS_OK)
+        stuck_subscribers = [sock for sock in self.daemon._subscribers
+                             if sock not in subscribers]
+        self.assertEqual(len(stuck_subscribers), 1)
+
+        # The stuck subscriber never reads, so its buffer fills up.
+        path = "/" + "x" * 10000
+        for __ in range(10000):
+            self.daemon.notify(stuck_subscribers, path)
+            if not stuck_subscribers:
+                break
+        self.assertListEqual(stuck_subscribers, [])
+        self.assertEqual(set(self.daemon._subscribers), subscribers)
+        stuck.close()
+
+    def test_change_notification_invalidates_cache(self):
+        self.assertEqual(
+            self.client.get_setting(self.config_path, "http", "timeout_sec"),
+            1.5
+        )
+        self.rewrite_config("[http]\ntimeout_sec = 3\n")
+        self.assertListEqual(self.daemon.check_files(), [self.config_path])
+
+        # The notification is handled asynchronously by the client.
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            value = self.client.get_setting(self.config_path, "http",
+                                            "timeout_sec")
+            if value == 3:
+                break
+            time.sleep(0.01)
+        self.assertEqual(value, 3)
+        self.assertListEqual(self.daemon.check_files(), [])
+
+    def test_invalid_config(self):
+        self.rewrite_config("path = /tmp/\n")
+        with self.assertRaises(config_daemon.DaemonError) as context:
+            self.client.get_config(self.config_path)
+        self.assertIn(self.config_path, str(context.exception))
+
+    def test_missing_file(self):
+        with self.assertRaises(config_daemon.DaemonError):
+            self.client.get_config(os.path.join(self.directory, "missing"))
+
+    def test_stale_socket_is_removed(self):
+        socket_path = os.path.join(self.directory, "stale.sock")
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(socket_path)
+        stale.close()
+        daemon = config_daemon.ConfigDaemon(socket_path)
+        daemon.start()
+        try:
+            with config_daemon.ConfigClient(socket_path) as client:
+                self.assertEqual(
+                    client.get_setting(self.config_path, "http",
+                                       "timeout_sec"),
+                    1.5
+                )
+        finally:
+            daemon.shutdown()
+
+    def test_socket_in_use(self):
+        with self.assertRaises(config_daemon.DaemonError):
+            config_daemon.ConfigDaemon(self.daemon.socket_path)
+        self.assertTrue(os.path.exists(self.daemon.socket_path))
+
+    def test_main_removes_socket_on_sigterm(self):
+        socket_path = os.path.join(self.directory, "main.sock")
+        process = subprocess.Popen([sys.executable, "config_daemon.py",
+                                    socket_path])
+        try:
+            # Wait until the daemon answers requests.
+            deadline = time.time() + 10
+            while True:
+                try:
+                    with config_daemon.ConfigClient(socket_path) as client:
+                        client.get_config(self.config_path)
+                    break
+                except socket.error:
+                    if time.time() > deadline:
+                        raise
+                    time.sleep(0.01)
+        finally:
+            process.send_signal(signal.SIGTERM)
+            self.assertEqual(process.wait(), 0)
+        self.assertFalse(os.path.exists(socket_path))
+
+    def test_shutdown_closes_connections(self):
+        self.client.get_config(self.config_path)
+        self.daemon.shutdown()
+        with self.assertRaises((config_daemon.DaemonError, socket.error)):
+            self.client.get_group(self.config_path, "http")
+        # The daemon is already stopped for `tearDown`.
+        self.daemon.shutdown = lambda: None
+
+    def send_request(self, request):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.daemon.socket_path)
+        try:
+            config_daemon.send_frame(sock, config_daemon.OP_GET, request)
+            return config_daemon.recv_frame(sock)
+        finally:
+            sock.close()
+
+    def test_invalid_requests(self):
+        for request in [
+            [0, None, None, None],
+            ["relative.conf", None, None, None],
+            [self.config_path, "production", None, None],
+            [self.config_path, [1], None, None],
+            [self.config_path, None, 1, None],
+            [self.config_path, None, "ftp", ["path"]],
+            [self.config_path, None, None],
+            "request",
+        ]:
+            code, __ = self.send_request(request)
+            self.assertEqual(code, config_daemon.STATUS_ERROR)
+        self.assertEqual(self.daemon._signatures, {})
+        code, value = self.send_request(
+            [self.config_path, ["ubuntu"], "ftp", "path"])
+        self.assertEqual(code, config_daemon.STATUS_OK)
+        self.assertEqual(value, "/etc/var/uploads")
+
+    def test_allowed_directories(self):
+        socket_path = os.path.join(self.directory, "allowed.sock")
+        allowed = os.path.join(self.directory, "allowed")
+        os.mkdir(allowed)
+        allowed_path = os.path.join(allowed, "settings.conf")
+        shutil.copy(self.config_path, allowed_path)
+        daemon = config_daemon.ConfigDaemon(socket_path,
+                                            allowed_directories=[allowed])
+        daemon.start()
+        try:
+            with config_daemon.ConfigClient(socket_path) as client:
+                self.assertEqual(
+                    client.get_setting(allowed_path, "http", "timeout_sec"),
+                    1.5
+                )
+                for path in [self.config_path,
+                             os.path.join(allowed, "..", "settings.conf")]:
+                    with self.assertRaises(config_daemon.DaemonError):
+                        client.get_config(path)
+        finally:
+            daemon.shutdown()
+
+    def test_missing_file_is_not_watched(self):
+        with self.assertRaises(config_daemon.DaemonError):
+            self.client.get_config(os.path.join(self.directory, "missing"))
+        self.client.get_config(self.config_path)
+        self.assertListEqual(list(self.daemon._signatures), [self.config_path])
+
+        # A file loaded with other overrides is still watched.
+        self.rewrite_config("garbage\n")
+        with self.assertRaises(config_daemon.DaemonError):
+            self.client.get_config(self.config_path, overrides=["ubuntu"])
+        self.assertListEqual(list(self.daemon._signatures), [self.config_path])
+
+    def test_idle_file_is_forgotten(self):
+        self.assertEqual(
+            self.client.get_setting(self.config_path, "http", "timeout_sec"),
+            1.5
+        )
+        self.daemon.idle_timeout = -1
+        self.assertListEqual(self.daemon.check_files(), [self.config_path])
+        self.assertEqual(self.daemon._signatures, {})
+        self.assertEqual(self.daemon._configs, {})
+
+        # The client drops its cache like for a change.
+        self.rewrite_config("[http]\ntimeout_sec = 3\n")
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            value = self.client.get_setting(self.config_path, "http",
+                                            "timeout_sec")
+            if value == 3:
+                break
+            time.sleep(0.01)
+        self.assertEqual(value, 3)
+
+    def wait_for_cache(self, key):
+        deadline = time.time() + 5
+        while key not in self.client._cache and time.time() < deadline:
+            self.client.get_group(self.config_path, "http")
+            time.sleep(0.01)
+        self.assertIn(key, self.client._cache)
+
+    def test_client_reconnects_after_daemon_restart(self):
+        key = (self.config_path, (), "http", None)
+        self.wait_for_cache(key)
+        socket_path = self.daemon.socket_path
+        self.daemon.shutdown()
+        self.daemon = config_daemon.ConfigDaemon(socket_path,
+                                                 poll_interval=60)
+        self.daemon.start()
+
+        self.rewrite_config("[http]\ntimeout_sec = 3\n")
+        self.client._listener.join(5)
+        self.assertEqual(
+            self.client.get_setting(self.config_path, "http", "timeout_sec"),
+            3
+        )
+        # Caching is back once subscribed again.
+        self.wait_for_cache(key)
+
+    def test_client_subscribes_again_after_being_dropped(self):
+        key = (self.config_path, (), "http", None)
+        self.wait_for_cache(key)
+        for sock in list(self.daemon._subscribers):
+            self.daemon.unsubscribe(sock)
+            sock.shutdown(socket.SHUT_RDWR)
+        self.client._listener.join(5)
+        self.assertNotIn(key, self.client._cache)
+
+        self.wait_for_cache(key)
+        self.assertEqual(len(self.daemon._subscribers), 1)
+        self.assertTrue(self.client._listener.is_alive())
+
+    def test_closed_client(self):
+        self.client.close()
+        with self.assertRaises(config_daemon.DaemonError):
+            self.client.get_config(self.config_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
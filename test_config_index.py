@@ -0,0 +1,196 @@
+# Run with: `python -m unittest discover`
+
+import os
+import shutil
+import tempfile
+import unittest
+import config_index
+
+
+class TestIsInRange(unittest.TestCase):
+    """Class to test `is_in_range` method."""
+
+    def test_numbers_in_range(self):
+        self.assertTrue(config_index.is_in_range(1, 1, 2))
+        self.assertTrue(config_index.is_in_range(1.5, None, 2))
+        self.assertFalse(config_index.is_in_range(3, None, 2))
+
+    def test_non_numbers_never_in_range(self):
+        self.assertFalse(config_index.is_in_range(True, None, None))
+        self.assertFalse(config_index.is_in_range("1", None, None))
+        self.assertFalse(config_index.is_in_range([1], None, None))
+
+
+class TestConfigIndex(unittest.TestCase):
+    """Class to test `ConfigIndex` class."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.small_path = os.path.join(self.directory, "small.conf")
+        shutil.copy("./test_config_data/config_small.conf", self.small_path)
+        self.other_path = self.write_config(
+            "other.conf",
+            "[common]\nbasic_size_limit = 100\n\n"
+            "[ftp]\npath<production> = /srv/other/\n"
+        )
+        self.index = config_index.ConfigIndex()
+        self.index.update([self.small_path, self.other_path])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_config(self, name, contents):
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+        else:
+            stat = None
+        with open(path, "w") as fp:
+            fp.write(contents)
+        if stat is not None:
+            # Make sure the signature changes even on coarse mtimes.
+            os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        return path
+
+    def test_key_query(self):
+        entries = self.index.query("common", "basic_size_limit")
+        self.assertListEqual(
+            [(entry.path, entry.line_number, entry.value) for entry in entries],
+            [(self.other_path, 2, 100), (self.small_path, 2, 26214400)]
+        )
+
+    def test_glob_query(self):
+        entries = self.index.query("*", "*size_limit")
+        self.assertEqual(len(entries), 3)
+        self.assertListEqual(self.index.query("missing*"), [])
+
+    def test_value_range_query(self):
+        entries = self.index.query("*", "basic_size_limit", minimum=1000)
+        self.assertListEqual([entry.path for entry in entries],
+                             [self.small_path])
+        entries = self.index.query("http", "timeout_sec", maximum=1)
+        self.assertListEqual(entries, [])
+
+    def test_override_query(self):
+        entries = self.index.query("*", "path", override="production")
+        self.assertListEqual(
+            [(entry.path, entry.group, entry.value) for entry in entries],
+            [(self.other_path, "ftp", "/srv/other/"),
+             (self.small_path, "ftp", "/srv/var/tmp/")]
+        )
+        entries = self.index.query("ftp", "path", override=None)
+        self.assertListEqual([entry.value for entry in entries], ["/tmp/"])
+
+    def test_resolved_query(self):
+        entries = self.index.query("ftp", "path",
+                                   overrides=["production", "ubuntu"])
+        self.assertListEqual(
+            [(entry.path, entry.override, entry.value) for entry in entries],
+            [(self.other_path, "production", "/srv/other/"),
+             (self.small_path, "ubuntu", "/etc/var/uploads")]
+        )
+        entries = self.index.query("ftp", "path", overrides=[])
+        self.assertListEqual([entry.value for entry in entries], ["/tmp/"])
+
+    def test_update_is_incremental(self):
+        self.assertListEqual(
+            self.index.update([self.small_path, self.other_path]), [])
+
+        self.write_config("other.conf", "[common]\nbasic_size_limit = 5\n")
+        new_path = self.write_config("new.conf", "[http]\ntimeout_sec = 2\n")
+        self.assertListEqual(
+            self.index.update([self.other_path, new_path]),
+            [self.small_path, new_path, self.other_path]
+        )
+        self.assertNotIn(self.small_path, self.index)
+        self.assertListEqual(
+            [entry.value for entry in self.index.query("*", "basic_size_limit")],
+            [5]
+        )
+        self.assertListEqual(self.index.query("ftp", "path"), [])
+        self.assertEqual(len(self.index.query("http", "timeout_sec")), 1)
+
+    def test_invalid_file(self):
+        path = self.write_config("invalid.conf", "path = /tmp/\n")
+        self.index.update([self.small_path, path])
+        self.assertIn(path, self.index.errors)
+        self.assertIn(path, self.index)
+
+        self.write_config("invalid.conf", "[ftp]\npath = /tmp/\n")
+        self.index.update([self.small_path, path])
+        self.assertNotIn(path, self.index.errors)
+        self.assertEqual(len(self.index.query("ftp", "path", override=None)), 2)
+
+    def test_corrupt_compressed_file(self):
+        with open("./test_config_data/config_small.conf.gz", "rb") as fp:
+            data = fp.read()
+        # Sorted before the other files, which must still be indexed.
+        path = os.path.join(self.directory, "a_corrupt.conf.gz")
+        with open(path, "wb") as fp:
+            fp.write(data[:len(data) // 2])
+        index = config_index.ConfigIndex()
+        index.update([path, self.small_path, self.other_path])
+        self.assertIn(path, index)
+        self.assertIn("file at " + path, index.errors[path])
+        self.assertEqual(len(index.query("common", "basic_size_limit")), 2)
+
+        # The error is kept until the file is fixed.
+        self.assertListEqual(
+            index.update([path, self.small_path, self.other_path]), [])
+        self.assertIn(path, index.errors)
+        shutil.copy("./test_config_data/config_small.conf.gz", path)
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        index.update([path, self.small_path, self.other_path])
+        self.assertDictEqual(index.errors, {})
+        self.assertEqual(len(index.query("common", "basic_size_limit")), 3)
+
+    def test_save_and_load(self):
+        index_path = os.path.join(self.directory, "config.index")
+        self.index.add_file(os.path.join(self.directory, "missing.conf"))
+        self.index.save(index_path)
+
+        index = config_index.ConfigIndex.load(index_path)
+        self.assertEqual(len(index), 3)
+        self.assertListEqual(index.query(), self.index.query())
+        self.assertListEqual(
+            index.query("ftp", "path", overrides=["ubuntu"]),
+            self.index.query("ftp", "path", overrides=["ubuntu"])
+        )
+        self.assertEqual(index.errors, self.index.errors)
+        self.assertEqual(index._keys, self.index._keys)
+        self.assertListEqual(
+            [name for name in os.listdir(self.directory)
+             if name.endswith(".tmp")],
+            []
+        )
+        # A loaded index only parses the files which changed since.
+        self.assertListEqual(
+            index.update([self.small_path, self.other_path]),
+            [os.path.join(self.directory, "missing.conf")]
+        )
+
+    def test_remove_file_keeps_other_files(self):
+        self.index.remove_file(self.small_path)
+        self.assertNotIn(self.small_path, self.index._keys)
+        self.assertListEqual(self.index.query("http"), [])
+        self.assertListEqual(
+            [(entry.path, entry.value)
+             for entry in self.index.query("common", "basic_size_limit")],
+            [(self.other_path, 100)]
+        )
+        self.assertEqual(
+            set(self.index._entries),
+            {("common", "basic_size_limit"), ("ftp", "path")}
+        )
+
+    def test_load_unsupported_version(self):
+        index_path = os.path.join(self.directory, "config.index")
+        with open(index_path, "w") as fp:
+            fp.write('{"version": 0, "files": {}}')
+        with self.assertRaises(ValueError):
+            config_index.ConfigIndex.load(index_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,11 @@
 # Run with: `python -m unittest discover`
 
+import bz2
+import gzip
+import io
+import os
+import shutil
+import tempfile
 import unittest
 import config_parser
 
@@ -212,6 +218,26 @@ class TestParseSettingOverrideValue(unittest.TestCase):
         )
 
 
+class TestParseEntries(unittest.TestCase):
+    """Class to test `parse_entries` method."""
+
+    def test_valid_entries(self):
+        lines = ["[ftp]\n", "; comment\n", "path = /tmp/\n",
+                 "path<production> = /srv/var/tmp/\n"]
+        self.assertListEqual(
+            list(config_parser.parse_entries(lines, "<string>")),
+            [
+                (1, "ftp", None, None, None),
+                (3, "ftp", "path", None, "/tmp/"),
+                (4, "ftp", "path", "production", "/srv/var/tmp/"),
+            ]
+        )
+
+    def test_invalid_duplicate_group(self):
+        with self.assertRaises(config_parser.DuplicateGroupError):
+            list(config_parser.parse_entries(["[ftp]", "[ftp]"], "<string>"))
+
+
 class TestLoadConfig(unittest.TestCase):
     """Class to test `load_config` method."""
 
@@ -288,5 +314,180 @@ class TestLoadConfig(unittest.TestCase):
             __ = config_parser.load_config("./test_config_data/config_missing_file.conf")
 
 
+class TestSplitLines(unittest.TestCase):
+    """Class to test `split_lines` method."""
+
+    def test_lines_within_chunk(self):
+        chunks = ["[http]\npath = /tmp/\n"]
+        self.assertListEqual(
+            list(config_parser.split_lines(chunks)),
+            ["[http]\n", "path = /tmp/\n"]
+        )
+
+    def test_line_across_chunks(self):
+        chunks = ["[ht", "tp]\npa", "th = /tmp/"]
+        self.assertListEqual(
+            list(config_parser.split_lines(chunks)),
+            ["[http]\n", "path = /tmp/"]
+        )
+
+
+def gzip_bytes(data):
+    """Function to return the given bytes as a gzip member."""
+    stream = io.BytesIO()
+    with gzip.GzipFile(fileobj=stream, mode="wb") as fp:
+        fp.write(data)
+    return stream.getvalue()
+
+
+class TestDecompressChunks(unittest.TestCase):
+    """Class to test `decompress_chunks` method."""
+
+    def test_output_chunk_size(self):
+        data = b"\n" * (config_parser.CHUNK_SIZE * 20 + 1)
+        for compressed in [gzip_bytes(data), bz2.compress(data)]:
+            chunks = list(config_parser.decompress_chunks(
+                config_parser.slice_chunks(compressed)))
+            self.assertLessEqual(max(len(chunk) for chunk in chunks),
+                                 config_parser.CHUNK_SIZE)
+            self.assertEqual(sum(len(chunk) for chunk in chunks), len(data))
+
+    def test_plain_chunks_unchanged(self):
+        chunks = ["[ftp]\n", "path = /tmp/\n"]
+        self.assertListEqual(
+            list(config_parser.decompress_chunks(chunks)), chunks)
+
+
+class TestLoads(unittest.TestCase):
+    """Class to test `loads` method."""
+
+    def test_valid_string(self):
+        CONFIG = config_parser.loads(
+            "[ftp]\npath = /tmp/\npath<production> = /srv/var/tmp/\n",
+            overrides=["production"])
+        self.assertEqual(CONFIG.ftp.path, "/srv/var/tmp/")
+
+    def test_valid_bytes(self):
+        with open("./test_config_data/config_small.conf", "rb") as fp:
+            CONFIG = config_parser.loads(fp.read())
+        self.assertEqual(CONFIG.common.student_size_limit, 52428800)
+
+    def test_valid_gzip_bytes(self):
+        with open("./test_config_data/config_small.conf.gz", "rb") as fp:
+            CONFIG = config_parser.loads(fp.read())
+        self.assertEqual(CONFIG.common.student_size_limit, 52428800)
+
+    def test_empty_string(self):
+        self.assertDictEqual(config_parser.loads(""), {})
+
+    def test_multi_member_gzip_bytes(self):
+        CONFIG = config_parser.loads(gzip_bytes(b"[ftp]\npath = /tmp/\n") +
+                                     gzip_bytes(b"[http]\ntimeout_sec = 2\n"))
+        self.assertEqual(CONFIG.ftp.path, "/tmp/")
+        self.assertEqual(CONFIG.http.timeout_sec, 2)
+
+    def test_multi_stream_bzip2_bytes(self):
+        CONFIG = config_parser.loads(bz2.compress(b"[ftp]\npath = /tmp/\n") +
+                                     bz2.compress(b"[http]\nenabled = no\n"))
+        self.assertEqual(CONFIG.ftp.path, "/tmp/")
+        self.assertFalse(CONFIG.http.enabled)
+
+    def test_invalid_truncated_compressed_bytes(self):
+        for name in ["config_small.conf.gz", "config_small.conf.bz2"]:
+            with open("./test_config_data/" + name, "rb") as fp:
+                data = fp.read()
+            for size in [len(data) // 2, len(data) - 1]:
+                with self.assertRaises(config_parser.DecompressionError) \
+                        as context:
+                    config_parser.loads(data[:size])
+                self.assertIn("<string>", str(context.exception))
+
+    def test_invalid_trailing_data(self):
+        with self.assertRaises(config_parser.DecompressionError):
+            config_parser.loads(gzip_bytes(b"[ftp]\n") + b"garbage")
+
+    def test_invalid_corrupt_compressed_bytes(self):
+        for data in [b"\x1f\x8b" + b"corrupt" * 10, b"BZh9" + b"corrupt" * 10]:
+            with self.assertRaises(config_parser.DecompressionError) \
+                    as context:
+                config_parser.loads(data)
+            self.assertIn("<string>", str(context.exception))
+
+    @unittest.skipIf(config_parser.lzma is not None, "lzma is available")
+    def test_invalid_xz_bytes_without_lzma(self):
+        with open("./test_config_data/config_small.conf.xz", "rb") as fp:
+            data = fp.read()
+        with self.assertRaises(config_parser.DecompressionError) as context:
+            config_parser.loads(data)
+        self.assertIn("xz", str(context.exception))
+
+    def test_invalid_string_error_names_source(self):
+        with self.assertRaises(config_parser.MissingGroupError) as context:
+            config_parser.loads("path = /tmp/\n")
+        self.assertIn("<string>", str(context.exception))
+
+
+class TestLoad(unittest.TestCase):
+    """Class to test `load` method."""
+
+    def test_valid_text_file_object(self):
+        with open("./test_config_data/config_small.conf") as fp:
+            CONFIG = config_parser.load(fp, overrides=["ubuntu"])
+        self.assertEqual(CONFIG.ftp.path, "/etc/var/uploads")
+
+    def test_valid_bytes_stream(self):
+        with open("./test_config_data/config_small.conf.bz2", "rb") as fp:
+            stream = io.BytesIO(fp.read())
+        CONFIG = config_parser.load(stream)
+        self.assertListEqual(CONFIG.http.params, ["array", "of", "values"])
+
+    def test_invalid_stream_error_names_source(self):
+        with self.assertRaises(config_parser.InvalidLineError) as context:
+            config_parser.load(io.BytesIO(b"[http]\ngarbage\n"))
+        self.assertIn("<stream>", str(context.exception))
+
+
+class TestLoadCompressedConfig(unittest.TestCase):
+    """Class to test `load_config` method with compressed files."""
+
+    def assertSmallConfig(self, file_path):
+        CONFIG = config_parser.load_config(file_path, overrides=["ubuntu"])
+        self.assertEqual(CONFIG.common.student_size_limit, 52428800)
+        self.assertEqual(CONFIG.ftp.path, "/etc/var/uploads")
+        self.assertEqual(CONFIG.http.timeout_sec, 1.5)
+
+    def test_valid_gzip_config(self):
+        self.assertSmallConfig("./test_config_data/config_small.conf.gz")
+
+    def test_valid_bzip2_config(self):
+        self.assertSmallConfig("./test_config_data/config_small.conf.bz2")
+
+    @unittest.skipIf(config_parser.lzma is None, "lzma is not available")
+    def test_valid_xz_config(self):
+        self.assertSmallConfig("./test_config_data/config_small.conf.xz")
+
+    def test_invalid_corrupt_config_error_names_file(self):
+        with open("./test_config_data/config_small.conf.gz", "rb") as fp:
+            data = fp.read()
+        directory = tempfile.mkdtemp()
+        file_path = os.path.join(directory, "config_corrupt.conf.gz")
+        # Flip bytes in the middle of the deflate stream.
+        with open(file_path, "wb") as fp:
+            fp.write(data[:20] + b"\xff" * 20 + data[40:])
+        try:
+            with self.assertRaises(config_parser.DecompressionError) \
+                    as context:
+                config_parser.load_config(file_path)
+        finally:
+            shutil.rmtree(directory)
+        self.assertIn("file at " + file_path, str(context.exception))
+
+    def test_invalid_config_error_names_file(self):
+        file_path = "./test_config_data/config_garbage_line.conf"
+        with self.assertRaises(config_parser.InvalidLineError) as context:
+            config_parser.load_config(file_path)
+        self.assertIn("file at " + file_path, str(context.exception))
+
+
 if __name__ == "__main__":
     unittest.main()